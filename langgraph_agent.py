@@ -1,18 +1,30 @@
 # Backend - langgraph_agent.py
 import openai
-import requests
+import httpx
 import json
+import orjson
+import diskcache
 import re
 import os
-from typing import Dict, List, Optional, Any, TypedDict, Annotated
+import asyncio
+import threading
+import sqlite3
+import time
+from contextlib import closing
+import numpy as np
+from typing import Dict, List, Optional, Any, TypedDict, Annotated, AsyncIterator, Tuple
 from dataclasses import dataclass
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.tools import Tool
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from langchain_core.globals import set_llm_cache
+from langchain_community.cache import SQLiteCache
 import operator
 import logging
 
@@ -23,6 +35,35 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file
 load_dotenv()
 
+# Wolfram and semantic cache lifetimes; real-time lookups go stale much sooner
+WOLFRAM_CACHE_TTL = 86400
+WOLFRAM_REALTIME_CACHE_TTL = 600
+_REALTIME_RE = re.compile(r"\b(weather|forecast|temperature in|time in|current|now|today|stock|price|exchange rate)\b", re.I)
+
+# Semantic cache hits must agree on every number in the query ("x^2" vs "x^3")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+SEMANTIC_CACHE_MAX_ENTRIES = 5000
+
+# Keyword fast-path for obvious queries; anything matching both or neither goes to the LLM classifier
+_WOLFRAM_RE = re.compile(r"\b(integral|derivative|solve|convert|population of|fahrenheit|celsius|compound interest|matrix|equation|probability|speed of light|[0-9]+\s*(kg|km|mi|mph|°))\b", re.I)
+_CHAT_RE = re.compile(r"\b(joke|how are you|favorite|explain|tell me about)\b", re.I)
+
+# Step-by-step podstates per query type; each names the pod holding that type's primary answer
+_STEP_BY_STEP_PODSTATES = [
+    (re.compile(r"\bderivative\b", re.I), "Input__Step-by-step solution"),
+    (re.compile(r"\bintegral\b", re.I), "IndefiniteIntegral__Step-by-step solution"),
+    (re.compile(r"\bsolve\b", re.I), "Result__Step-by-step solution"),
+]
+
+def _extract_pod_results(data: Dict[str, Any]) -> List[str]:
+    """Return "title: plaintext" lines for every non-empty subpod in a Wolfram Alpha JSON response"""
+    return [
+        f"{pod.get('title', '')}: {plaintext}"
+        for pod in data['queryresult'].get('pods', [])
+        for subpod in pod.get('subpods', [])
+        if (plaintext := subpod.get('plaintext')) and plaintext.strip()
+    ]
+
 @dataclass
 class ToolResult:
     """Result from a tool execution"""
@@ -31,29 +72,164 @@ class ToolResult:
     error: Optional[str] = None
     source: Optional[str] = None
 
+class QueryPlan(BaseModel):
+    """Structured classifier output: whether to use Wolfram Alpha and with what query"""
+    needs_wolfram: bool = Field(description="True if the query requires Wolfram Alpha")
+    wolfram_query: Optional[str] = Field(default=None, description="Optimized Wolfram Alpha query, or null if not needed")
+
 class AgentState(TypedDict):
     """State of the agent workflow"""
     messages: Annotated[List, add_messages]
     user_query: str
     needs_wolfram: bool
+    wolfram_query: Optional[str]
     wolfram_result: Optional[str]
+    direct_response: Optional[str]  # Speculative answer drafted alongside classification
     final_response: Optional[str]
     used_wolfram: bool  # Track if Wolfram was actually used
 
+class SemanticCache:
+    """Nearest-neighbour cache of chat responses keyed on query embeddings
+    
+    Only meant for conversational answers: paraphrase matching cannot tell
+    "100 fahrenheit to celsius" from "100 celsius to fahrenheit", so Wolfram
+    answers are left to the exact-key Wolfram result cache.
+    
+    Entries live in SQLite so several worker processes can share them; each
+    process mirrors the vectors in memory and picks up new rows incrementally.
+    Disk access runs in a worker thread to keep the event loop free.
+    """
+    
+    def __init__(self, embeddings: OpenAIEmbeddings, path: str = ".semantic_cache.db", threshold: float = 0.05,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache, creating the SQLite table at `path` if needed
+        
+        Args:
+            embeddings: Embedding model used to vectorize queries
+            path: SQLite database the cache is persisted to
+            threshold: Maximum cosine distance for a query to count as a hit
+            max_entries: Number of most recent entries kept; older ones are evicted
+        """
+        self.embeddings = embeddings
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._expires = np.empty(0, dtype=np.float64)
+        self._vectors: Optional[np.ndarray] = None
+        self._numbers: List[str] = []
+        self._last_id = 0
+        
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, vector BLOB NOT NULL, numbers TEXT NOT NULL, "
+                "content TEXT NOT NULL, used_wolfram INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the cache database"""
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def _sync(self, conn: sqlite3.Connection):
+        """Mirror rows added since the last sync and drop expired or evicted ones"""
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, vector, numbers, expires_at FROM entries WHERE id > ? AND expires_at > ? ORDER BY id",
+            (self._last_id, now)
+        ).fetchall()
+        
+        if rows:
+            vectors = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if self._vectors is None or not len(self._ids):
+                self._vectors = vectors
+            else:
+                self._vectors = np.vstack([self._vectors, vectors])
+            self._ids = np.concatenate([self._ids, [row[0] for row in rows]])
+            self._expires = np.concatenate([self._expires, [row[3] for row in rows]])
+            self._numbers.extend(row[2] for row in rows)
+            self._last_id = rows[-1][0]
+        
+        # Ids are shared across processes, so every mirror evicts the same entries
+        keep = (self._expires > now) & (self._ids > self._last_id - self.max_entries)
+        if not keep.all():
+            self._ids = self._ids[keep]
+            self._expires = self._expires[keep]
+            self._vectors = self._vectors[keep]
+            self._numbers = [n for n, k in zip(self._numbers, keep) if k]
+    
+    def _lookup(self, vector: np.ndarray, numbers: str) -> Optional[Dict[str, Any]]:
+        """Blocking part of `lookup`"""
+        with self._lock, closing(self._connect()) as conn:
+            self._sync(conn)
+            if not len(self._ids):
+                return None
+            
+            distances = 1.0 - self._vectors @ vector
+            for index in np.argsort(distances):
+                if distances[index] >= self.threshold:
+                    return None
+                if self._numbers[index] == numbers:
+                    row = conn.execute(
+                        "SELECT content, used_wolfram FROM entries WHERE id = ?",
+                        (int(self._ids[index]),)
+                    ).fetchone()
+                    if row:
+                        return {"content": row[0], "used_wolfram": bool(row[1])}
+        return None
+    
+    def _add(self, vector: np.ndarray, numbers: str, content: str, used_wolfram: bool, ttl: float):
+        """Blocking part of `add`"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO entries (vector, numbers, content, used_wolfram, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (vector.astype(np.float32).tobytes(), numbers, content, int(used_wolfram), now + ttl)
+            )
+            conn.execute(
+                "DELETE FROM entries WHERE expires_at <= ? OR id <= (SELECT MAX(id) FROM entries) - ?",
+                (now, self.max_entries)
+            )
+    
+    async def embed(self, query: str) -> np.ndarray:
+        """Return the unit-normalized embedding of a query"""
+        vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+    
+    async def lookup(self, query: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the closest unexpired entry within the threshold whose numbers match `query`"""
+        numbers = " ".join(_NUMBER_RE.findall(query))
+        return await asyncio.to_thread(self._lookup, vector, numbers)
+    
+    async def add(self, query: str, vector: np.ndarray, content: str, used_wolfram: bool):
+        """Store a response for `query`, expiring real-time queries sooner"""
+        numbers = " ".join(_NUMBER_RE.findall(query))
+        ttl = WOLFRAM_REALTIME_CACHE_TTL if _REALTIME_RE.search(query) else WOLFRAM_CACHE_TTL
+        try:
+            await asyncio.to_thread(self._add, vector, numbers, content, used_wolfram, ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist semantic cache entry: {e}")
+
 class WolframAlphaLangGraphAgent:
     """Agent that uses LangGraph to orchestrate GPT-4o with Wolfram Alpha API"""
     
-    def __init__(self, openai_api_key: Optional[str] = None, wolfram_app_id: Optional[str] = None):
+    def __init__(self, openai_api_key: Optional[str] = None, wolfram_app_id: Optional[str] = None, speculative: bool = True):
         """
         Initialize the agent with API keys
         
         Args:
             openai_api_key: OpenAI API key (optional, will use env var if not provided)
             wolfram_app_id: Wolfram Alpha App ID (optional, will use env var if not provided)
+            speculative: Draft the direct response concurrently with classification,
+                trading wasted tokens on Wolfram queries for one less round-trip on the rest
         """
         # Use provided keys or fall back to environment variables
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         self.wolfram_app_id = wolfram_app_id or os.getenv("WOLFRAM_APP_ID")
+        self.speculative = speculative
         
         # Validate API keys
         if not self.openai_api_key:
@@ -65,47 +241,17 @@ class WolframAlphaLangGraphAgent:
         self.llm = ChatOpenAI(
             model="gpt-4o",
             api_key=self.openai_api_key,
-            temperature=0
+            temperature=0,
+            cache=True
         )
         
-        self.wolfram_base_url = "http://api.wolframalpha.com/v2/query"
-        self.last_used_wolfram = False  # Track last usage
+        # Cache LLM responses on disk so repeated prompts skip the OpenAI round-trip
+        set_llm_cache(SQLiteCache(database_path=".langchain_cache.db"))
         
-        # Build the workflow graph
-        self.workflow = self._build_workflow()
-        self.app = self.workflow.compile()
-        
-        logger.info("WolframAlphaLangGraphAgent initialized successfully")
-    
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow"""
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes
-        workflow.add_node("classifier", self._classify_query)
-        workflow.add_node("wolfram_search", self._query_wolfram)
-        workflow.add_node("generate_response", self._generate_response)
-        
-        # Add edges
-        workflow.set_entry_point("classifier")
-        workflow.add_conditional_edges(
-            "classifier",
-            self._should_use_wolfram,
-            {
-                "wolfram": "wolfram_search",
-                "direct": "generate_response"
-            }
-        )
-        workflow.add_edge("wolfram_search", "generate_response")
-        workflow.add_edge("generate_response", END)
-        
-        return workflow
-    
-    def _classify_query(self, state: AgentState) -> AgentState:
-        """Classify whether the query needs Wolfram Alpha"""
-        
-        classification_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a query classifier. Determine if a user query requires Wolfram Alpha for computational, mathematical, scientific, or factual lookups.
+        # Prompt templates are built once so every request shares the same static prefix
+        self._classify_tmpl = ChatPromptTemplate.from_messages([
+            ("system", """You are a query classifier and an expert at formulating queries for Wolfram Alpha.
+First, determine if a user query requires Wolfram Alpha for computational, mathematical, scientific, or factual lookups.
 
 USE WOLFRAM ALPHA for:
 - Mathematical calculations, equations, derivatives, integrals
@@ -135,24 +281,148 @@ DO NOT USE WOLFRAM ALPHA for:
 - General advice
 - Programming help (unless it involves mathematical calculations)
 
-Respond with ONLY 'YES' if Wolfram Alpha is needed, or 'NO' if it's not needed."""),
+If Wolfram Alpha is needed, also create the most effective Wolfram Alpha query.
+
+Guidelines:
+- Keep it concise and specific
+- Use mathematical notation when appropriate
+- For unit conversions, use format like "100 fahrenheit to celsius"
+- For equations, use standard mathematical syntax like "solve 2x + 5 = 15"
+- For derivatives, use "derivative of x^2 + 3x"
+- For integrals, use "integral of x^2 + 3x"
+- For population data, use "population of [city/country]"
+- For scientific constants, be specific like "speed of light"
+- Remove unnecessary words and focus on the core computation
+
+Examples:
+- "What is the integral of x squared plus 3x?" → "integral of x^2 + 3x"
+- "Convert 100 degrees Fahrenheit to Celsius" → "100 fahrenheit to celsius"
+- "What's the population of Tokyo?" → "population of Tokyo"
+- "Solve the equation 2x plus 5 equals 15" → "solve 2x + 5 = 15"
+
+Set needs_wolfram to true or false. Set wolfram_query to the Wolfram Alpha query if needed, otherwise null."""),
+            ("human", "{query}")
+        ])
+        
+        self._respond_with_wolfram_tmpl = ChatPromptTemplate.from_messages([
+            ("system", """You are a helpful AI assistant. The user asked a question that required computational/factual lookup, and you received results from Wolfram Alpha.
+
+Based on the Wolfram Alpha results, provide a clear, helpful response to the user's original question. 
+- Explain the results in an understandable way
+- If there are multiple pieces of information, organize them clearly
+- If the Wolfram Alpha query failed, acknowledge this and try to provide what help you can
+- Be conversational and helpful
+- Don't mention "Wolfram Alpha" unless it's relevant to explain the source
+
+Be conversational and helpful."""),
+            ("human", "Original question: {original_query}"),
+            ("human", "Wolfram Alpha results: {wolfram_result}")
+        ])
+        
+        self._respond_direct_tmpl = ChatPromptTemplate.from_messages([
+            ("system", """You are a helpful AI assistant. Respond to the user's question directly and conversationally. 
+This question doesn't require computational tools or factual lookups - just provide a helpful, engaging response.
+
+Be friendly, informative, and conversational."""),
             ("human", "{query}")
         ])
         
+        # Classifier that also formulates the Wolfram query in the same call
+        self.planner = self.llm.with_structured_output(QueryPlan)
+        
+        # Short-circuit paraphrased queries before running the workflow
+        self.semantic_cache = SemanticCache(
+            OpenAIEmbeddings(api_key=self.openai_api_key),
+            path=".semantic_cache.db"
+        )
+        
+        self.wolfram_base_url = "http://api.wolframalpha.com"
+        self.http: Optional[httpx.AsyncClient] = None  # Shared keep-alive client, see _get_http_client
+        self.wcache = diskcache.Cache(".wolfram_cache")  # Parsed results keyed on the formulated query
+        
+        # Build the workflow graph
+        self.workflow = self._build_workflow()
+        self.app = self.workflow.compile()
+        
+        logger.info("WolframAlphaLangGraphAgent initialized successfully")
+    
+    def _build_workflow(self) -> StateGraph:
+        """Build the LangGraph workflow"""
+        workflow = StateGraph(AgentState)
+        
+        # Add nodes
+        workflow.add_node("classifier", self._classify_query)
+        workflow.add_node("wolfram_search", self._query_wolfram)
+        workflow.add_node("generate_response", self._generate_response)
+        
+        # Add edges
+        workflow.set_entry_point("classifier")
+        workflow.add_conditional_edges(
+            "classifier",
+            self._should_use_wolfram,
+            {
+                "wolfram": "wolfram_search",
+                "direct": "generate_response"
+            }
+        )
+        workflow.add_edge("wolfram_search", "generate_response")
+        workflow.add_edge("generate_response", END)
+        
+        return workflow
+    
+    async def _classify_query(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Classify whether the query needs Wolfram Alpha and formulate the Wolfram query in one call"""
+        speculative = config.get("configurable", {}).get("speculative", self.speculative)
+        return await self._plan_query(state, speculative)
+    
+    async def _plan_query(self, state: AgentState, speculative: bool) -> Dict[str, Any]:
+        """Run the classifier, optionally drafting the direct response concurrently"""
+        
+        query = state["user_query"]
+        wolfram_match = _WOLFRAM_RE.search(query) is not None
+        chat_match = _CHAT_RE.search(query) is not None
+        
+        # Obvious chat queries skip the LLM classifier entirely
+        if chat_match and not wolfram_match:
+            logger.info("Query classification (keyword): Direct response")
+            
+            return {
+                "needs_wolfram": False,
+                "wolfram_query": None,
+                "direct_response": None,
+                "used_wolfram": False,
+                "messages": [
+                    SystemMessage(content="Query classification: Direct response")
+                ]
+            }
+        
+        # Likely Wolfram queries still need the planner to formulate the Wolfram
+        # query, but drafting a direct answer for them would be wasted
+        draft_task = None
+        if speculative and not wolfram_match:
+            draft_task = asyncio.create_task(
+                self.llm.ainvoke(self._respond_direct_tmpl.format_messages(query=state["user_query"]))
+            )
+        
         try:
-            response = self.llm.invoke(
-                classification_prompt.format_messages(query=state["user_query"])
+            plan = await self.planner.ainvoke(
+                self._classify_tmpl.format_messages(query=state["user_query"])
             )
             
-            needs_wolfram = response.content.strip().upper() == "YES"
+            needs_wolfram = plan.needs_wolfram
+            wolfram_query = None
+            if needs_wolfram:
+                # Fall back to the raw question if the model left the query empty
+                wolfram_query = (plan.wolfram_query or "").strip() or state["user_query"]
             
             logger.info(f"Query classification: {'Needs Wolfram Alpha' if needs_wolfram else 'Direct response'}")
             
             return {
-                **state,
                 "needs_wolfram": needs_wolfram,
+                "wolfram_query": wolfram_query,
+                "direct_response": None if needs_wolfram else await self._await_draft(draft_task),
                 "used_wolfram": False,
-                "messages": state["messages"] + [
+                "messages": [
                     SystemMessage(content=f"Query classification: {'Needs Wolfram Alpha' if needs_wolfram else 'Direct response'}")
                 ]
             }
@@ -160,64 +430,48 @@ Respond with ONLY 'YES' if Wolfram Alpha is needed, or 'NO' if it's not needed."
         except Exception as e:
             logger.error(f"Error in classification: {e}")
             return {
-                **state,
                 "needs_wolfram": False,
+                "wolfram_query": None,
+                "direct_response": await self._await_draft(draft_task),
                 "used_wolfram": False,
-                "messages": state["messages"] + [
+                "messages": [
                     SystemMessage(content=f"Classification error: {e}")
                 ]
             }
+        
+        finally:
+            # Discard the draft if it is still pending, e.g. on the Wolfram path
+            if draft_task is not None and not draft_task.done():
+                draft_task.cancel()
+    
+    async def _await_draft(self, draft_task: Optional[asyncio.Task]) -> Optional[str]:
+        """Return the speculative direct response, or None if unavailable"""
+        if draft_task is None:
+            return None
+        try:
+            return (await draft_task).content
+        except Exception as e:
+            logger.warning(f"Speculative direct response failed: {e}")
+            return None
     
     def _should_use_wolfram(self, state: AgentState) -> str:
         """Decide the next step based on classification"""
         return "wolfram" if state["needs_wolfram"] else "direct"
     
-    def _query_wolfram(self, state: AgentState) -> AgentState:
+    async def _query_wolfram(self, state: AgentState) -> Dict[str, Any]:
         """Query Wolfram Alpha API"""
         
-        # First, let the LLM formulate the best query for Wolfram Alpha
-        query_formulation_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert at formulating queries for Wolfram Alpha. 
-Given a user question, create the most effective Wolfram Alpha query.
-
-Guidelines:
-- Keep it concise and specific
-- Use mathematical notation when appropriate
-- For unit conversions, use format like "100 fahrenheit to celsius"
-- For equations, use standard mathematical syntax like "solve 2x + 5 = 15"
-- For derivatives, use "derivative of x^2 + 3x"
-- For integrals, use "integral of x^2 + 3x"
-- For population data, use "population of [city/country]"
-- For scientific constants, be specific like "speed of light"
-- Remove unnecessary words and focus on the core computation
-
-Examples:
-- "What is the integral of x squared plus 3x?" → "integral of x^2 + 3x"
-- "Convert 100 degrees Fahrenheit to Celsius" → "100 fahrenheit to celsius"
-- "What's the population of Tokyo?" → "population of Tokyo"
-- "Solve the equation 2x plus 5 equals 15" → "solve 2x + 5 = 15"
-
-Return ONLY the Wolfram Alpha query, nothing else."""),
-            ("human", "{original_query}")
-        ])
-        
         try:
-            # Get optimized query
-            wolfram_query_response = self.llm.invoke(
-                query_formulation_prompt.format_messages(original_query=state["user_query"])
-            )
-            
-            wolfram_query = wolfram_query_response.content.strip()
+            wolfram_query = state["wolfram_query"]
             logger.info(f"Wolfram Alpha query: {wolfram_query}")
             
             # Execute Wolfram Alpha query
-            result = self._execute_wolfram_query(wolfram_query)
+            result = await self._execute_wolfram_query(wolfram_query)
             
             return {
-                **state,
                 "wolfram_result": result.result if result.success else f"Error: {result.error}",
                 "used_wolfram": result.success,
-                "messages": state["messages"] + [
+                "messages": [
                     SystemMessage(content=f"Wolfram Query: {wolfram_query}"),
                     SystemMessage(content=f"Wolfram Result: {result.result if result.success else result.error}")
                 ]
@@ -226,29 +480,86 @@ Return ONLY the Wolfram Alpha query, nothing else."""),
         except Exception as e:
             logger.error(f"Error in Wolfram query: {e}")
             return {
-                **state,
                 "wolfram_result": f"Error querying Wolfram Alpha: {str(e)}",
                 "used_wolfram": False,
-                "messages": state["messages"] + [
+                "messages": [
                     SystemMessage(content=f"Wolfram Alpha error: {e}")
                 ]
             }
     
-    def _execute_wolfram_query(self, query: str) -> ToolResult:
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                base_url=self.wolfram_base_url,
+                timeout=30,
+                limits=httpx.Limits(max_keepalive_connections=20)
+            )
+        return self.http
+    
+    async def start(self):
+        """Open the shared HTTP client ahead of the first Wolfram Alpha query"""
+        self._get_http_client()
+    
+    async def aclose(self):
+        """Close the shared HTTP client and the Wolfram result cache"""
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+        self.wcache.close()
+    
+    def _build_wolfram_params(self, query: str) -> Dict[str, str]:
+        """
+        Build Wolfram Alpha request parameters, trimming the response server-side
+        
+        Only plaintext is requested and the InputInterpretation pod, which just
+        echoes the query, is excluded. The Input pod is kept because it carries
+        the answer for some query types (e.g. derivatives). Step-by-step solutions
+        are requested for derivatives, integrals and equations, using the podstate
+        of the pod that holds each type's answer.
+        
+        Args:
+            query: The formulated Wolfram Alpha query
+            
+        Returns:
+            Query string parameters for the /v2/query endpoint
+        """
+        params = {
+            'appid': self.wolfram_app_id,
+            'input': query,
+            'format': 'plaintext',
+            'output': 'json',
+            'excludepodid': 'InputInterpretation'
+        }
+        
+        for pattern, podstate in _STEP_BY_STEP_PODSTATES:
+            if pattern.search(query):
+                params['podstate'] = podstate
+                break
+        
+        return params
+    
+    async def _execute_wolfram_query(self, query: str) -> ToolResult:
         """Execute a query against Wolfram Alpha API"""
+        key = query.strip().lower()
+        # diskcache blocks on SQLite and its cross-process lock, so keep it off the event loop
+        cached = await asyncio.to_thread(self.wcache.get, key)
+        if cached is not None:
+            logger.info(f"Wolfram Alpha cache hit: {query}")
+            return ToolResult(
+                success=True,
+                result=cached,
+                source="wolfram_alpha_cache"
+            )
+        
         try:
-            params = {
-                'appid': self.wolfram_app_id,
-                'input': query,
-                'format': 'plaintext',
-                'output': 'json'
-            }
+            params = self._build_wolfram_params(query)
             
             logger.info(f"Executing Wolfram Alpha query: {query}")
-            response = requests.get(self.wolfram_base_url, params=params, timeout=30)
+            response = await self._get_http_client().get("/v2/query", params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             if not data.get('queryresult', {}).get('success', False):
                 logger.warning("Wolfram Alpha query was not successful")
@@ -260,17 +571,7 @@ Return ONLY the Wolfram Alpha query, nothing else."""),
                 )
             
             # Extract meaningful results
-            pods = data['queryresult'].get('pods', [])
-            results = []
-            
-            for pod in pods:
-                title = pod.get('title', '')
-                subpods = pod.get('subpods', [])
-                
-                for subpod in subpods:
-                    plaintext = subpod.get('plaintext', '')
-                    if plaintext and plaintext.strip():
-                        results.append(f"{title}: {plaintext}")
+            results = _extract_pod_results(data)
             
             if not results:
                 logger.warning("No readable results found from Wolfram Alpha")
@@ -284,13 +585,16 @@ Return ONLY the Wolfram Alpha query, nothing else."""),
             result_text = '\n'.join(results)
             logger.info(f"Wolfram Alpha result: {result_text[:200]}...")
             
+            ttl = WOLFRAM_REALTIME_CACHE_TTL if _REALTIME_RE.search(key) else WOLFRAM_CACHE_TTL
+            await asyncio.to_thread(self.wcache.set, key, result_text, expire=ttl)
+            
             return ToolResult(
                 success=True,
                 result=result_text,
                 source="wolfram_alpha"
             )
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Wolfram Alpha API request failed: {e}")
             return ToolResult(
                 success=False,
@@ -307,56 +611,37 @@ Return ONLY the Wolfram Alpha query, nothing else."""),
                 source="wolfram_alpha"
             )
     
-    def _generate_response(self, state: AgentState) -> AgentState:
+    def _has_wolfram_result(self, state: AgentState) -> bool:
+        """Whether the state holds a usable Wolfram Alpha result"""
+        return bool(state["needs_wolfram"] and state.get("wolfram_result") and state.get("used_wolfram"))
+    
+    def _response_messages(self, state: AgentState) -> List:
+        """Build the final response prompt based on whether we have Wolfram data"""
+        if self._has_wolfram_result(state):
+            return self._respond_with_wolfram_tmpl.format_messages(
+                original_query=state["user_query"],
+                wolfram_result=state["wolfram_result"]
+            )
+        
+        # Direct response without Wolfram Alpha
+        return self._respond_direct_tmpl.format_messages(query=state["user_query"])
+    
+    async def _generate_response(self, state: AgentState) -> Dict[str, Any]:
         """Generate the final response"""
         
-        # Create the response prompt based on whether we have Wolfram data
-        if state["needs_wolfram"] and state.get("wolfram_result") and state.get("used_wolfram"):
-            response_prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a helpful AI assistant. The user asked a question that required computational/factual lookup, and you received results from Wolfram Alpha.
-
-Based on the Wolfram Alpha results, provide a clear, helpful response to the user's original question. 
-- Explain the results in an understandable way
-- If there are multiple pieces of information, organize them clearly
-- If the Wolfram Alpha query failed, acknowledge this and try to provide what help you can
-- Be conversational and helpful
-- Don't mention "Wolfram Alpha" unless it's relevant to explain the source
-
-Be conversational and helpful."""),
-                ("human", "Original question: {original_query}"),
-                ("human", "Wolfram Alpha results: {wolfram_result}")
-            ])
-            
-            response = self.llm.invoke(
-                response_prompt.format_messages(
-                    original_query=state["user_query"],
-                    wolfram_result=state["wolfram_result"]
-                )
-            )
+        if not self._has_wolfram_result(state) and state.get("direct_response"):
+            # Reuse the answer drafted speculatively during classification
+            content = state["direct_response"]
         else:
-            # Direct response without Wolfram Alpha
-            direct_prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a helpful AI assistant. Respond to the user's question directly and conversationally. 
-This question doesn't require computational tools or factual lookups - just provide a helpful, engaging response.
-
-Be friendly, informative, and conversational."""),
-                ("human", "{query}")
-            ])
-            
-            response = self.llm.invoke(
-                direct_prompt.format_messages(query=state["user_query"])
-            )
-        
-        # Update the instance variable for tracking
-        self.last_used_wolfram = state.get("used_wolfram", False)
+            response = await self.llm.ainvoke(self._response_messages(state))
+            content = response.content
         
         return {
-            **state,
-            "final_response": response.content,
-            "messages": state["messages"] + [AIMessage(content=response.content)]
+            "final_response": content,
+            "messages": [AIMessage(content=content)]
         }
     
-    def chat(self, user_message: str, debug: bool = False) -> str:
+    async def chat(self, user_message: str, debug: bool = False) -> Tuple[str, bool]:
         """
         Process a user message and return a response
         
@@ -365,39 +650,122 @@ Be friendly, informative, and conversational."""),
             debug: Whether to print debug information
             
         Returns:
-            The agent's response
+            The agent's response and whether Wolfram Alpha was used
         """
         try:
-            # Initialize state
-            initial_state = {
-                "messages": [HumanMessage(content=user_message)],
-                "user_query": user_message,
-                "needs_wolfram": False,
-                "wolfram_result": None,
-                "final_response": None,
-                "used_wolfram": False
-            }
+            query_vector, cached = await self._cached_response(user_message)
+            if cached:
+                return cached["content"], cached["used_wolfram"]
             
             # Run the workflow
-            final_state = self.app.invoke(initial_state)
-            
-            # Update instance variable
-            self.last_used_wolfram = final_state.get("used_wolfram", False)
+            final_state = await self.app.ainvoke(self._initial_state(user_message))
+            used_wolfram = final_state.get("used_wolfram", False)
             
             if debug:
                 logger.info(f"Debug Info:")
                 logger.info(f"- Needs Wolfram: {final_state['needs_wolfram']}")
-                logger.info(f"- Used Wolfram: {final_state.get('used_wolfram', False)}")
+                logger.info(f"- Used Wolfram: {used_wolfram}")
                 if final_state.get('wolfram_result'):
                     logger.info(f"- Wolfram Result: {final_state['wolfram_result'][:200]}...")
                 logger.info(f"- Final Response Length: {len(final_state['final_response'])}")
                 logger.info("-" * 50)
             
-            return final_state["final_response"]
+            await self._store_response(user_message, query_vector, final_state)
+            
+            return final_state["final_response"], used_wolfram
             
         except Exception as e:
             logger.error(f"Error processing request: {e}")
-            return f"I apologize, but I encountered an error processing your request: {str(e)}"
+            return f"I apologize, but I encountered an error processing your request: {str(e)}", False
+    
+    async def chat_stream(self, user_message: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Process a user message and stream the response as it is generated
+        
+        Args:
+            user_message: The user's message
+            
+        Yields:
+            ("delta", text) for each chunk of the agent's response, then a
+            final ("done", used_wolfram) item
+        """
+        used_wolfram = False
+        try:
+            query_vector, cached = await self._cached_response(user_message)
+            if cached:
+                yield "delta", cached["content"]
+                yield "done", cached["used_wolfram"]
+                return
+            
+            # A speculative draft would hold back the first token until the whole answer is ready
+            config = {"configurable": {"speculative": False}}
+            final_state = None
+            streamed = False
+            async for mode, chunk in self.app.astream(
+                self._initial_state(user_message), config, stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    final_state = chunk
+                    continue
+                # Token chunks only; the finished AIMessage added to state is emitted too
+                message, metadata = chunk
+                if (isinstance(message, AIMessageChunk) and message.content
+                        and metadata.get("langgraph_node") == "generate_response"):
+                    streamed = True
+                    yield "delta", message.content
+            
+            # LLM cache hits complete without emitting any tokens
+            if not streamed:
+                yield "delta", final_state["final_response"]
+            
+            used_wolfram = final_state.get("used_wolfram", False)
+            await self._store_response(user_message, query_vector, final_state)
+            
+        except Exception as e:
+            logger.error(f"Error processing streaming request: {e}")
+            used_wolfram = False
+            yield "delta", f"I apologize, but I encountered an error processing your request: {str(e)}"
+        
+        yield "done", used_wolfram
+    
+    async def _cached_response(self, user_message: str) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]:
+        """
+        Look up a paraphrase of the message in the semantic cache
+        
+        Returns:
+            The message embedding (None if embedding failed) and the cached entry, if any
+        """
+        query_vector = None
+        try:
+            query_vector = await self.semantic_cache.embed(user_message)
+            cached = await self.semantic_cache.lookup(user_message, query_vector)
+            if cached:
+                logger.info("Semantic cache hit")
+            return query_vector, cached
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return query_vector, None
+    
+    async def _store_response(self, user_message: str, query_vector: Optional[np.ndarray], final_state: Dict[str, Any]):
+        """Store a finished answer in the semantic cache; only conversational answers are kept, see SemanticCache"""
+        if query_vector is None or final_state["needs_wolfram"]:
+            return
+        await self.semantic_cache.add(
+            user_message, query_vector, final_state["final_response"], final_state.get("used_wolfram", False)
+        )
+    
+    def _initial_state(self, user_message: str) -> AgentState:
+        """Build the initial workflow state for a user message"""
+        return {
+            "messages": [HumanMessage(content=user_message)],
+            "user_query": user_message,
+            "needs_wolfram": False,
+            "wolfram_query": None,
+            "wolfram_result": None,
+            "direct_response": None,
+            "final_response": None,
+            "used_wolfram": False
+        }
     
     def get_workflow_diagram(self) -> str:
         """Get a text representation of the workflow"""
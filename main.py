@@ -1,12 +1,17 @@
 # Backend - main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
-from langgraph_agent import WolframAlphaLangGraphAgent
+import orjson
+import msgspec
+import asyncio
+import os
 import logging
 import traceback
+import time
 from datetime import datetime
 
 # Configure logging
@@ -28,24 +33,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Pydantic models
-class ChatMessage(BaseModel):
+# msgspec structs for the chat hot path; decoded and encoded without Pydantic
+class ChatMessage(msgspec.Struct, kw_only=True):
     id: Optional[int] = None
     type: str  # 'user' or 'bot'
     content: str
     timestamp: Optional[str] = None
     usedWolfram: Optional[bool] = False
 
-class ChatRequest(BaseModel):
+class ChatRequest(msgspec.Struct):
     message: str
     conversation_history: Optional[List[ChatMessage]] = []
 
-class ChatResponse(BaseModel):
+class ChatResponse(msgspec.Struct):
     content: str
     usedWolfram: bool
     timestamp: str
     processingTime: float
 
+# OpenAPI schemas for the msgspec structs, registered under components/schemas
+_, _CHAT_SCHEMA_COMPONENTS = msgspec.json.schema_components(
+    [ChatRequest, ChatResponse],
+    ref_template="#/components/schemas/{name}"
+)
+_CHAT_REQUEST_BODY = {
+    "requestBody": {
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ChatRequest"}}},
+        "required": True
+    }
+}
+
+_default_openapi = app.openapi
+
+def _openapi_with_chat_schemas():
+    """Generate the OpenAPI schema, adding the msgspec chat schemas"""
+    schema = _default_openapi()
+    schema.setdefault("components", {}).setdefault("schemas", {}).update(_CHAT_SCHEMA_COMPONENTS)
+    return schema
+
+app.openapi = _openapi_with_chat_schemas
+
+# Pydantic models
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
@@ -53,19 +81,40 @@ class HealthResponse(BaseModel):
 
 # Global agent instance
 agent = None
+_init_task = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the agent on startup"""
+def _create_agent():
+    """Import and construct the agent; runs in a worker thread"""
+    from langgraph_agent import WolframAlphaLangGraphAgent
+    return WolframAlphaLangGraphAgent()
+
+async def _init_agent():
+    """Initialize the agent without blocking the event loop"""
     global agent
     try:
         logger.info("Initializing Wolfram Alpha LangGraph Agent...")
-        agent = WolframAlphaLangGraphAgent()
+        new_agent = await asyncio.to_thread(_create_agent)
+        await new_agent.start()
+        agent = new_agent
         logger.info("Agent initialized successfully!")
     except Exception as e:
         logger.error(f"Failed to initialize agent: {str(e)}")
         logger.error(traceback.format_exc())
 
+@app.on_event("startup")
+async def startup_event():
+    """Start initializing the agent in the background; requests get 503 until it is ready"""
+    global _init_task
+    _init_task = asyncio.create_task(_init_agent())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the agent's HTTP connections on shutdown"""
+    if _init_task and not _init_task.done():
+        _init_task.cancel()
+    if agent:
+        await agent.aclose()
+
 @app.get("/", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -75,8 +124,19 @@ async def health_check():
         agent_initialized=agent is not None
     )
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def _decode_chat_request(request: Request) -> ChatRequest:
+    """Decode and validate a chat request body"""
+    try:
+        return msgspec.json.decode(await request.body(), type=ChatRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid chat request: {str(e)}")
+
+@app.post(
+    "/api/chat",
+    openapi_extra=_CHAT_REQUEST_BODY,
+    responses={200: {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/ChatResponse"}}}}}
+)
+async def chat_endpoint(request: Request):
     """Main chat endpoint"""
     if not agent:
         raise HTTPException(
@@ -84,32 +144,28 @@ async def chat_endpoint(request: ChatRequest):
             detail="Agent not initialized. Please check server logs."
         )
     
+    chat_request = await _decode_chat_request(request)
+    
     try:
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         # Log the request
-        logger.info(f"Received chat request: {request.message[:100]}...")
+        logger.info(f"Received chat request: {chat_request.message[:100]}...")
         
         # Process the message with the agent
-        response_content = agent.chat(request.message, debug=False)
-        logger.info(f"Agent decision - Used Wolfram: {agent.last_used_wolfram if hasattr(agent, 'last_used_wolfram') else 'Unknown'}")
-        
+        response_content, used_wolfram = await agent.chat(chat_request.message, debug=False)
         
-        # Determine if Wolfram Alpha was used
-        # This is a simple heuristic - in a real implementation, you'd get this from the agent
-        used_wolfram = agent.last_used_wolfram if hasattr(agent, 'last_used_wolfram') else False
-        
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
+        processing_time = time.perf_counter() - start_time
         
         logger.info(f"Response generated in {processing_time:.2f}s, Wolfram used: {used_wolfram}")
         
-        return ChatResponse(
+        response = ChatResponse(
             content=response_content,
             usedWolfram=used_wolfram,
-            timestamp=end_time.isoformat(),
+            timestamp=datetime.now().isoformat(),
             processingTime=processing_time
         )
+        return Response(content=msgspec.json.encode(response), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
@@ -119,26 +175,48 @@ async def chat_endpoint(request: ChatRequest):
             detail=f"Error processing your request: {str(e)}"
         )
 
-def _heuristic_wolfram_detection(response_content: str) -> bool:
-    """
-    Simple heuristic to detect if Wolfram Alpha was used
-    In a real implementation, this would be returned by the agent
-    """
-    wolfram_indicators = [
-        "wolfram alpha",
-        "computational",
-        "calculation",
-        "integral",
-        "derivative",
-        "equation",
-        "conversion",
-        "according to",
-        "results show",
-        "computed"
-    ]
+@app.post(
+    "/api/chat/stream",
+    openapi_extra=_CHAT_REQUEST_BODY,
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}}
+)
+async def chat_stream_endpoint(request: Request):
+    """Streaming chat endpoint using Server-Sent Events"""
+    if not agent:
+        raise HTTPException(
+            status_code=503,
+            detail="Agent not initialized. Please check server logs."
+        )
+    
+    chat_request = await _decode_chat_request(request)
+    logger.info(f"Received streaming chat request: {chat_request.message[:100]}...")
+    
+    async def event_stream():
+        start_time = time.perf_counter()
+        
+        used_wolfram = False
+        
+        async for kind, value in agent.chat_stream(chat_request.message):
+            if kind == "delta":
+                yield f"data: {orjson.dumps({'delta': value}).decode()}\n\n"
+            else:
+                used_wolfram = value
+        
+        processing_time = time.perf_counter() - start_time
+        
+        logger.info(f"Streamed response in {processing_time:.2f}s, Wolfram used: {used_wolfram}")
+        
+        # Final event carries the metadata the non-streaming endpoint returns
+        done = {
+            "done": True,
+            "usedWolfram": used_wolfram,
+            "timestamp": datetime.now().isoformat(),
+            "processingTime": processing_time
+        }
+        yield f"data: {orjson.dumps(done).decode()}\n\n"
     
-    response_lower = response_content.lower()
-    return any(indicator in response_lower for indicator in wolfram_indicators)
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @app.get("/api/status")
 async def get_status():
@@ -150,6 +228,7 @@ async def get_status():
         "endpoints": [
             "/",
             "/api/chat",
+            "/api/chat/stream",
             "/api/status"
         ]
     }
@@ -178,10 +257,16 @@ async def get_examples():
     }
 
 if __name__ == "__main__":
+    # Each worker process runs its own startup_event and agent. The on-disk
+    # caches are safe to share between them: the LLM and semantic caches are
+    # SQLite databases and the Wolfram result cache uses diskcache.
+    # loop/http "auto" pick uvloop and httptools when installed (not on Windows).
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        workers=int(os.getenv("WORKERS", "4")),
+        loop="auto",
+        http="auto",
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Checks for query routing in WolframAlphaLangGraphAgent, with the LLM calls stubbed out."""
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from langgraph_agent import QueryPlan, WolframAlphaLangGraphAgent
+
+
+class StubPlanner:
+    def __init__(self, plan):
+        self.plan = plan
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return self.plan
+
+
+class StubEmbeddings:
+    async def aembed_query(self, query):
+        return [1.0, 0.0, 0.0]
+
+
+class StubLLM:
+    def __init__(self, content="direct answer"):
+        self.content = content
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=self.content)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # The agent creates its caches in the working directory
+    monkeypatch.chdir(tmp_path)
+    agent = WolframAlphaLangGraphAgent(openai_api_key="test-key", wolfram_app_id="test-app-id")
+    agent.llm = StubLLM()
+    agent.semantic_cache.embeddings = StubEmbeddings()
+    yield agent
+    asyncio.run(agent.aclose())
+
+
+def _plan(agent, query):
+    return asyncio.run(agent._plan_query(agent._initial_state(query), speculative=True))
+
+
+def test_chat_keyword_skips_planner(agent):
+    agent.planner = StubPlanner(QueryPlan(needs_wolfram=True, wolfram_query="unused"))
+    result = _plan(agent, "Tell me a joke about cats")
+    assert result["needs_wolfram"] is False
+    assert agent.planner.calls == 0
+    assert agent.llm.calls == 0
+
+
+def test_wolfram_keyword_still_formulates_query_without_draft(agent):
+    agent.planner = StubPlanner(QueryPlan(needs_wolfram=True, wolfram_query="integral of x^2 + 3x"))
+    result = _plan(agent, "What is the integral of x squared plus 3x?")
+    assert result["needs_wolfram"] is True
+    assert result["wolfram_query"] == "integral of x^2 + 3x"
+    assert agent.planner.calls == 1
+    assert agent.llm.calls == 0
+
+
+def test_wolfram_keyword_can_be_overruled_by_planner(agent):
+    agent.planner = StubPlanner(QueryPlan(needs_wolfram=False, wolfram_query=None))
+    result = _plan(agent, "How do I convert a string to int in Python?")
+    assert result["needs_wolfram"] is False
+    assert result["wolfram_query"] is None
+
+
+def test_unmatched_query_drafts_direct_response(agent):
+    agent.planner = StubPlanner(QueryPlan(needs_wolfram=False, wolfram_query=None))
+    result = _plan(agent, "hello")
+    assert result["direct_response"] == "direct answer"
+    assert agent.planner.calls == 1
+    assert agent.llm.calls == 1
+
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+
+def test_chat_stream_streams_tokens_from_the_workflow(agent):
+    agent.llm = GenericFakeChatModel(messages=iter(["why did the chicken cross"]))
+    items = asyncio.run(_collect(agent.chat_stream("Tell me a joke")))
+
+    deltas = [value for kind, value in items if kind == "delta"]
+    assert len(deltas) > 1
+    assert "".join(deltas) == "why did the chicken cross"
+    assert items[-1] == ("done", False)
+
+
+def test_chat_stream_reuses_semantic_cache_entry(agent):
+    content, used_wolfram = asyncio.run(agent.chat("Tell me a joke"))
+    assert (content, used_wolfram) == ("direct answer", False)
+
+    items = asyncio.run(_collect(agent.chat_stream("Tell me a joke")))
+    assert items == [("delta", "direct answer"), ("done", False)]
+    assert agent.llm.calls == 1
+
+
+def test_wolfram_answers_are_not_cached_semantically(agent):
+    vector = asyncio.run(agent.semantic_cache.embed("100 fahrenheit to celsius"))
+    final_state = {"needs_wolfram": True, "used_wolfram": True, "final_response": "37.8 degrees Celsius"}
+    asyncio.run(agent._store_response("100 fahrenheit to celsius", vector, final_state))
+
+    _, cached = asyncio.run(agent._cached_response("100 celsius to fahrenheit"))
+    assert cached is None
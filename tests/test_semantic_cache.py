@@ -0,0 +1,91 @@
+"""Checks for SemanticCache matching, cross-process sync and eviction."""
+import asyncio
+
+import numpy as np
+import pytest
+
+import langgraph_agent
+from langgraph_agent import SemanticCache
+
+
+class StubEmbeddings:
+    """Embeds every query to the same vector, so only the cache's own guards tell queries apart"""
+
+    async def aembed_query(self, query):
+        return [1.0, 0.0, 0.0]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _store(cache, query, content):
+    vector = _run(cache.embed(query))
+    _run(cache.add(query, vector, content, False))
+
+
+def _lookup(cache, query):
+    vector = _run(cache.embed(query))
+    hit = _run(cache.lookup(query, vector))
+    return hit["content"] if hit else None
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "semantic.db")
+
+
+def test_hit_after_add(db_path):
+    cache = SemanticCache(StubEmbeddings(), path=db_path)
+    assert _lookup(cache, "tell me a joke") is None
+    _store(cache, "tell me a joke", "a joke")
+    assert _lookup(cache, "tell me a joke please") == "a joke"
+
+
+def test_numbers_must_match(db_path):
+    cache = SemanticCache(StubEmbeddings(), path=db_path)
+    _store(cache, "integral of x^2", "x^3/3")
+    assert _lookup(cache, "integral of x^3") is None
+    assert _lookup(cache, "integral of x^2") == "x^3/3"
+
+
+def test_entries_are_shared_between_instances(db_path):
+    writer = SemanticCache(StubEmbeddings(), path=db_path)
+    reader = SemanticCache(StubEmbeddings(), path=db_path)
+    assert _lookup(reader, "hello") is None
+
+    # The reader has already synced once, so this row is picked up incrementally
+    _store(writer, "hello", "hi there")
+    assert _lookup(reader, "hello") == "hi there"
+
+
+def test_oldest_entries_are_evicted(db_path):
+    writer = SemanticCache(StubEmbeddings(), path=db_path, max_entries=2)
+    reader = SemanticCache(StubEmbeddings(), path=db_path, max_entries=2)
+    _store(writer, "query 1", "answer 1")
+    assert _lookup(reader, "query 1") == "answer 1"
+
+    _store(writer, "query 2", "answer 2")
+    _store(writer, "query 3", "answer 3")
+
+    assert _lookup(reader, "query 1") is None
+    assert list(reader._ids) == [2, 3]
+    assert len(reader._numbers) == len(reader._expires) == reader._vectors.shape[0] == 2
+    assert _lookup(reader, "query 3") == "answer 3"
+
+
+def test_expired_entries_are_dropped(db_path, monkeypatch):
+    cache = SemanticCache(StubEmbeddings(), path=db_path)
+    _store(cache, "what's the weather today", "sunny")
+    assert _lookup(cache, "what's the weather today") == "sunny"
+
+    now = langgraph_agent.time.time()
+    monkeypatch.setattr(langgraph_agent.time, "time", lambda: now + langgraph_agent.WOLFRAM_REALTIME_CACHE_TTL + 1)
+    assert _lookup(cache, "what's the weather today") is None
+    assert len(cache._ids) == 0
+
+
+def test_distant_vectors_miss(db_path):
+    cache = SemanticCache(StubEmbeddings(), path=db_path)
+    _run(cache.add("hello", np.array([1.0, 0.0, 0.0], dtype=np.float32), "hi", False))
+    assert _run(cache.lookup("hello", np.array([0.0, 1.0, 0.0], dtype=np.float32))) is None
@@ -0,0 +1,59 @@
+"""Checks for Wolfram Alpha request parameters and response extraction.
+
+The fixtures in tests/fixtures are hand-written, not captured from the real
+API. They follow the documented Wolfram Alpha v2 JSON response structure as
+returned with InputInterpretation excluded.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+import langgraph_agent
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _load_fixture(name):
+    with open(FIXTURES / name, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def agent():
+    # Bypass __init__ so no API keys, caches or network clients are needed
+    agent = langgraph_agent.WolframAlphaLangGraphAgent.__new__(langgraph_agent.WolframAlphaLangGraphAgent)
+    agent.wolfram_app_id = "test-app-id"
+    return agent
+
+
+@pytest.mark.parametrize("query, podstate", [
+    ("derivative of sin(x) * cos(x)", "Input__Step-by-step solution"),
+    ("integral of x^2 + 3x", "IndefiniteIntegral__Step-by-step solution"),
+    ("solve 2x + 5 = 15", "Result__Step-by-step solution"),
+])
+def test_build_wolfram_params_step_by_step(agent, query, podstate):
+    params = agent._build_wolfram_params(query)
+    assert params["podstate"] == podstate
+    assert params["excludepodid"] == "InputInterpretation"
+    assert params["format"] == "plaintext"
+
+
+def test_build_wolfram_params_plain_query(agent):
+    params = agent._build_wolfram_params("population of Tokyo")
+    assert "podstate" not in params
+    assert params["input"] == "population of Tokyo"
+    assert params["appid"] == "test-app-id"
+
+
+def test_extract_derivative_lists_titled_results_in_pod_order():
+    results = langgraph_agent._extract_pod_results(_load_fixture("wolfram_derivative.json"))
+    assert results == [
+        "Derivative: d/dx(sin(x) cos(x)) = cos(2 x)",
+        "Alternate form: cos^2(x) - sin^2(x)",
+    ]
+
+
+def test_extract_integral_skips_empty_subpods():
+    results = langgraph_agent._extract_pod_results(_load_fixture("wolfram_integral.json"))
+    assert results == ["Indefinite integral: integral(x^2 + 3 x) dx = x^3/3 + (3 x^2)/2 + constant"]